@@ -65,6 +65,9 @@ DEFAULT_MAX_TEMPLATE_SIZE = 10_000_000
 DEFAULT_CACHE_MAX_SIZE = 1000
 """Default maximum number of cached templates"""
 
+COMPILED_CODE_CACHE_SIZE = 1000
+"""Maximum number of validated+compiled expression code objects to cache"""
+
 DEFAULT_CACHE_TTL = 3600
 """Default cache time-to-live in seconds (1 hour)"""
 
@@ -88,6 +91,9 @@ ESCAPED_VAR_PATTERN = re.compile(r'\{\{\s*(.*?)\s*\}\}')
 RAW_VAR_PATTERN = re.compile(r'\{!!\s*(.*?)\s*!!\}')
 """Pattern for raw variable output: {!! variable !!}"""
 
+VAR_OUTPUT_PATTERN = re.compile(r'\{!!\s*(?P<raw>.*?)\s*!!\}|\{\{\s*(?P<esc>.*?)\s*\}\}')
+"""Combined pattern for {{ }} and {!! !!} output (single-pass dispatch)"""
+
 # Comment Pattern
 COMMENT_PATTERN = re.compile(r'\{\{--[\s\S]*?--\}\}')
 """Pattern for Blade comments: {{-- comment --}}"""
@@ -122,6 +128,9 @@ ISSET_PATTERN = re.compile(r'@isset\(\s*(["\'])(.*?)\1\s*\)([\s\S]*?)@endisset',
 EMPTY_PATTERN = re.compile(r'@empty\(\s*(["\'])(.*?)\1\s*\)([\s\S]*?)@endempty', re.DOTALL)
 """Pattern for @empty directive"""
 
+ISSET_EMPTY_PATTERN = re.compile(r'@(isset|empty)\(\s*(["\'])(.*?)\2\s*\)([\s\S]*?)@end\1', re.DOTALL)
+"""Combined pattern for @isset/@empty (single-pass dispatch)"""
+
 SWITCH_PATTERN = re.compile(r'@switch\((.*?)\)([\s\S]*?)@endswitch')
 """Pattern for @switch directive"""
 
@@ -146,6 +155,9 @@ IF_PATTERN = re.compile(r'@if\(')
 ENDIF_PATTERN = re.compile(r'@endif')
 """Pattern for @endif directive"""
 
+IF_OR_ENDIF_PATTERN = re.compile(r'@(?:if\(|endif\b)')
+"""Combined pattern for @if/@endif tokens (single-pass nesting scan)"""
+
 ELSEIF_PATTERN = re.compile(r'@elseif\(.*?\)|@else')
 """Pattern for @elseif and @else directives"""
 
@@ -135,6 +135,11 @@ class BladeEngine:
         from .evaluator import SafeEvaluator
         self._shared_evaluator = SafeEvaluator()
 
+        # Resolved template paths by name: resolution does normalization,
+        # traversal checks and Path.resolve() per call, but names map to
+        # the same path for the engine's lifetime
+        self._path_cache: Dict[str, str] = {}
+
         self.compiler = TemplateCompiler()
         self.parser = TemplateParser(self)
         self.directive_registry = DirectiveRegistry()
@@ -415,6 +420,13 @@ class BladeEngine:
         Raises:
             SecurityError: If path traversal is detected
         """
+        # Memoized per engine: only successful resolutions are cached, so
+        # rejected names keep raising through the full validation path
+        cached = self._path_cache.get(template_name)
+        if cached is not None:
+            return cached
+        requested_name = template_name
+
         # Reject absolute paths BEFORE normalization
         if os.path.isabs(template_name) or template_name.startswith('/') or template_name.startswith('\\'):
             from .exceptions import SecurityError
@@ -449,7 +461,9 @@ class BladeEngine:
                 f"Path traversal detected: '{template_name}' resolves outside template directory"
             )
 
-        return str(template_path)
+        resolved = str(template_path)
+        self._path_cache[requested_name] = resolved
+        return resolved
 
     def _merge_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Merge global variables with context"""
@@ -6,10 +6,58 @@ Prevents code injection attacks
 
 import ast
 import json
-from typing import Any, Dict
-
-from .exceptions import SecurityError, DirectiveError
-from .constants import ERROR_CONTEXT_MAX_LENGTH
+import operator
+import sys
+from types import CodeType
+from typing import Any, Callable, Dict, Optional
+
+from .exceptions import SecurityError, DirectiveError, UndefinedNameError
+from .constants import ERROR_CONTEXT_MAX_LENGTH, COMPILED_CODE_CACHE_SIZE
+
+# Validated+compiled code objects, keyed by (interned) source text.
+# Validation happens once; re-renders reuse the cached code object.
+# Module-level on purpose: every handler routes expressions through the
+# engine's shared SafeEvaluator, so identical expressions reused across
+# templates (loop iterables, switch cases, directive args) hit the same
+# cache regardless of which handler evaluated them first.
+_EVAL_CODE_CACHE: Dict[str, Any] = {}
+_EXEC_CODE_CACHE: Dict[str, Any] = {}
+
+
+# Comparison operators eligible for closure specialization
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
+def _first(collection, default=None):
+    """Get first item from collection"""
+    try:
+        return collection[0] if collection else default
+    except (IndexError, TypeError, KeyError):
+        return default
+
+
+def _last(collection, default=None):
+    """Get last item from collection"""
+    try:
+        return collection[-1] if collection else default
+    except (IndexError, TypeError, KeyError):
+        return default
+
+
+def _default_or(value, default=''):
+    """Return default if value is None or empty"""
+    return value if value else default
 
 
 class SafeEvaluator:
@@ -77,8 +125,14 @@ class SafeEvaluator:
         ast.Pass,
     )
 
-    # Safe builtins (shared across all evaluations for performance)
-    _SAFE_BUILTINS_BASE = {
+    # Frozenset variants for exact-type membership tests during validation
+    # (faster than isinstance against a long tuple)
+    _EVAL_ALLOWED_SET = frozenset(EVAL_ALLOWED_NODES)
+    _EXEC_ALLOWED_SET = frozenset(EXEC_ALLOWED_NODES)
+
+    # Safe builtins (built once at import time and shared across all
+    # evaluations - never mutated, so no per-call copy is needed)
+    _SAFE_BUILTINS = {
         # Type constructors
         "str": str,
         "int": int,
@@ -129,8 +183,165 @@ class SafeEvaluator:
         "is_dict": lambda x: isinstance(x, dict),
         "is_string": lambda x: isinstance(x, str),
         "is_number": lambda x: isinstance(x, (int, float)),
+
+        # Collection helpers
+        "first": _first,
+        "last": _last,
+        "default": _default_or,
     }
 
+    @classmethod
+    def _validate(cls, root: ast.AST, allowed_nodes: frozenset, disallowed_message: str, error_context: str):
+        """
+        Validate an AST against the node whitelist and dunder/private rules
+
+        Uses an explicit stack over node._fields instead of ast.walk - the
+        generic generator traversal dominates validation cost otherwise.
+
+        Raises:
+            SecurityError: If the tree contains disallowed nodes or names
+        """
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node_type = type(node)
+
+            if node_type not in allowed_nodes:
+                raise SecurityError(
+                    f"{disallowed_message}: {ast.dump(node)}",
+                    context=error_context
+                )
+
+            # Block dunder/private attribute access (e.g., __class__, _secret)
+            if node_type is ast.Attribute:
+                attr_name = node.attr
+                if attr_name.startswith('__') and attr_name.endswith('__'):
+                    raise SecurityError(
+                        f"Access to dunder attributes is forbidden: {attr_name}",
+                        context=error_context
+                    )
+                if attr_name.startswith('_'):
+                    raise SecurityError(
+                        f"Access to private attributes is forbidden: {attr_name}",
+                        context=error_context
+                    )
+
+            # Block dunder variable names (e.g., __builtins__, __import__)
+            elif node_type is ast.Name:
+                var_name = node.id
+                if var_name.startswith('__') and var_name.endswith('__'):
+                    raise SecurityError(
+                        f"Access to dunder names is forbidden: {var_name}",
+                        context=error_context
+                    )
+
+            for field in node._fields:
+                value = getattr(node, field, None)
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, ast.AST):
+                            stack.append(item)
+                elif isinstance(value, ast.AST):
+                    stack.append(value)
+
+    @classmethod
+    def _make_operand(cls, node: ast.AST) -> Optional[Callable]:
+        """Build a context getter for a Name or Constant operand, else None"""
+        if type(node) is ast.Constant:
+            value = node.value
+            return lambda ctx: value
+
+        # List/tuple display of constants, e.g. ["a", "b"]
+        if type(node) in (ast.List, ast.Tuple):
+            if all(type(elt) is ast.Constant for elt in node.elts):
+                values = tuple(elt.value for elt in node.elts)
+                if type(node) is ast.Tuple:
+                    # Immutable - the shared object is safe to reuse
+                    return lambda ctx: values
+                # Fresh list per call, like eval() of a list display:
+                # the closure is cached by expression text, so handing
+                # out one shared list would let a caller's mutation leak
+                # into every later evaluation of the same expression
+                return lambda ctx: list(values)
+            return None
+
+        if type(node) is ast.Name:
+            name = node.id
+            # 'context' and 'isset' live in the eval namespace, not the
+            # context dict - leave those to the generic eval path
+            if name in ('context', 'isset'):
+                return None
+
+            def get(ctx, _name=name, _builtins=cls._SAFE_BUILTINS):
+                try:
+                    return ctx[_name]
+                except KeyError:
+                    # Mirror eval()'s lookup order: the safe builtins back
+                    # the context, so names like 'len' resolve identically
+                    # on the specialized and generic paths
+                    try:
+                        return _builtins[_name]
+                    except KeyError:
+                        raise NameError(f"name '{_name}' is not defined") from None
+
+            return get
+
+        return None
+
+    @classmethod
+    def _specialize(cls, node: ast.Expression) -> Optional[Callable]:
+        """
+        Partially evaluate trivial expression shapes into direct closures
+
+        Common template conditions (`count > 0`, `user == "admin"`,
+        `status in ["a", "b"]`, bare names) skip the eval() frame setup
+        entirely. Returns None for anything non-trivial.
+        """
+        body = node.body
+
+        # Bare name or literal
+        simple = cls._make_operand(body)
+        if simple is not None:
+            return simple
+
+        # Single comparison where both sides are names/literals and at
+        # least one side is a literal
+        if type(body) is ast.Compare and len(body.ops) == 1:
+            op = _COMPARE_OPS.get(type(body.ops[0]))
+            left = cls._make_operand(body.left)
+            right = cls._make_operand(body.comparators[0])
+            has_literal = (
+                type(body.left) is not ast.Name
+                or type(body.comparators[0]) is not ast.Name
+            )
+            if op and left and right and has_literal:
+                return lambda ctx: op(left(ctx), right(ctx))
+
+        # Boolean chain of names/literals (short-circuit preserved)
+        if type(body) is ast.BoolOp:
+            getters = [cls._make_operand(value) for value in body.values]
+            if all(getters):
+                if type(body.op) is ast.And:
+                    def eval_and(ctx):
+                        result = True
+                        for getter in getters:
+                            result = getter(ctx)
+                            if not result:
+                                return result
+                        return result
+                    return eval_and
+
+                def eval_or(ctx):
+                    result = False
+                    for getter in getters:
+                        result = getter(ctx)
+                        if result:
+                            return result
+                    return result
+                return eval_or
+
+        return None
+
     @classmethod
     def safe_eval(cls, expr: str, context: Dict[str, Any]) -> Any:
         """
@@ -150,82 +361,52 @@ class SafeEvaluator:
         if not expr:
             return None
 
+        # Template expressions repeat heavily across renders - interning makes
+        # later cache lookups compare by pointer instead of by content
+        expr = sys.intern(expr)
+
         try:
-            # Parse expression
-            node = ast.parse(expr, mode='eval')
+            # Reuse a previously validated+compiled code object if available;
+            # a given expression only ever needs to be validated once
+            code = _EVAL_CODE_CACHE.get(expr)
 
-            # Validate all nodes
-            for subnode in ast.walk(node):
-                if not isinstance(subnode, cls.EVAL_ALLOWED_NODES):
-                    raise SecurityError(
-                        f"Disallowed expression: {ast.dump(subnode)}",
-                        context=expr
-                    )
+            if code is None:
+                # Parse expression
+                node = ast.parse(expr, mode='eval')
 
-                # Block dunder attribute access (e.g., __class__, __import__)
-                if isinstance(subnode, ast.Attribute):
-                    attr_name = subnode.attr
-                    if attr_name.startswith('__') and attr_name.endswith('__'):
-                        raise SecurityError(
-                            f"Access to dunder attributes is forbidden: {attr_name}",
-                            context=expr
-                        )
-                    # Also block _PrivateAttribute access for extra security
-                    if attr_name.startswith('_'):
-                        raise SecurityError(
-                            f"Access to private attributes is forbidden: {attr_name}",
-                            context=expr
-                        )
-
-                # Block dunder variable names (e.g., __builtins__, __import__)
-                if isinstance(subnode, ast.Name):
-                    var_name = subnode.id
-                    if var_name.startswith('__') and var_name.endswith('__'):
-                        raise SecurityError(
-                            f"Access to dunder names is forbidden: {var_name}",
-                            context=expr
-                        )
-
-            # Helper functions
-            def isset(var_name):
-                """Check if a variable is defined in the context"""
-                return var_name in context and context[var_name] is not None
-
-            def first(collection, default=None):
-                """Get first item from collection"""
-                try:
-                    return collection[0] if collection else default
-                except (IndexError, TypeError, KeyError):
-                    return default
+                # Validate all nodes
+                cls._validate(node, cls._EVAL_ALLOWED_SET, "Disallowed expression", expr)
+
+                # Trivial shapes become direct closures; the rest compile
+                code = cls._specialize(node)
+                if code is None:
+                    code = compile(node, '<string>', 'eval', optimize=2)
+
+                if len(_EVAL_CODE_CACHE) < COMPILED_CODE_CACHE_SIZE:
+                    _EVAL_CODE_CACHE[expr] = code
+
+            # Specialized closures read straight from the context mapping -
+            # no namespace copy, no eval() frame
+            if type(code) is not CodeType:
+                return code(context)
 
-            def last(collection, default=None):
-                """Get last item from collection"""
-                try:
-                    return collection[-1] if collection else default
-                except (IndexError, TypeError, KeyError):
-                    return default
-
-            def default_or(value, default=''):
-                """Return default if value is None or empty"""
-                return value if value else default
-
-            # Merge base builtins with context-dependent helpers
-            safe_builtins = {
-                **cls._SAFE_BUILTINS_BASE,
-                "first": first,
-                "last": last,
-                "isset": isset,
-                "default": default_or,
-            }
             # Add 'context' to namespace so expressions can use context.get()
             eval_namespace = context.copy()
             eval_namespace['context'] = context
+            # isset() is the only context-dependent helper, so it goes in the
+            # locals mapping; everything else lives in the shared builtins dict
+            eval_namespace['isset'] = (
+                lambda var_name: var_name in context and context[var_name] is not None
+            )
 
-            code = compile(node, '<string>', 'eval')
-            return eval(code, {"__builtins__": safe_builtins}, eval_namespace)
+            return eval(code, {"__builtins__": cls._SAFE_BUILTINS}, eval_namespace)
 
         except SecurityError:
             raise
+        except NameError as e:
+            # Distinct type so callers can treat undefined variables as falsy
+            # without string-matching the error message
+            raise UndefinedNameError(f"Error evaluating expression: {e}", context=expr)
         except Exception as e:
             raise DirectiveError(f"Error evaluating expression: {e}", context=expr)
 
@@ -246,43 +427,27 @@ class SafeEvaluator:
             return
 
         try:
-            # Parse code
-            node = ast.parse(code_str, mode='exec')
+            # Reuse a previously validated+compiled code object if available
+            code = _EXEC_CODE_CACHE.get(code_str)
 
-            # Validate all nodes
-            for subnode in ast.walk(node):
-                if not isinstance(subnode, cls.EXEC_ALLOWED_NODES):
-                    raise SecurityError(
-                        f"Disallowed statement in @python block: {ast.dump(subnode)}",
-                        context=code_str[:ERROR_CONTEXT_MAX_LENGTH]
-                    )
+            if code is None:
+                # Parse code
+                node = ast.parse(code_str, mode='exec')
+
+                # Validate all nodes
+                cls._validate(
+                    node,
+                    cls._EXEC_ALLOWED_SET,
+                    "Disallowed statement in @python block",
+                    code_str[:ERROR_CONTEXT_MAX_LENGTH]
+                )
+
+                # optimize=2 strips docstrings for smaller cached bytecode
+                code = compile(node, '<string>', 'exec', optimize=2)
+
+                if len(_EXEC_CODE_CACHE) < COMPILED_CODE_CACHE_SIZE:
+                    _EXEC_CODE_CACHE[code_str] = code
 
-                # Block dunder attribute access (e.g., __class__, __import__)
-                if isinstance(subnode, ast.Attribute):
-                    attr_name = subnode.attr
-                    if attr_name.startswith('__') and attr_name.endswith('__'):
-                        raise SecurityError(
-                            f"Access to dunder attributes is forbidden: {attr_name}",
-                            context=code_str[:ERROR_CONTEXT_MAX_LENGTH]
-                        )
-                    # Also block _PrivateAttribute access for extra security
-                    if attr_name.startswith('_'):
-                        raise SecurityError(
-                            f"Access to private attributes is forbidden: {attr_name}",
-                            context=code_str[:ERROR_CONTEXT_MAX_LENGTH]
-                        )
-
-                # Block dunder variable names (e.g., __builtins__, __import__)
-                if isinstance(subnode, ast.Name):
-                    var_name = subnode.id
-                    if var_name.startswith('__') and var_name.endswith('__'):
-                        raise SecurityError(
-                            f"Access to dunder names is forbidden: {var_name}",
-                            context=code_str[:ERROR_CONTEXT_MAX_LENGTH]
-                        )
-
-            # Compile and execute
-            code = compile(node, '<string>', 'exec')
             exec(code, {"__builtins__": {}}, context)
 
         except SecurityError:
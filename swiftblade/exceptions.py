@@ -42,6 +42,11 @@ class DirectiveError(TemplateException):
     pass
 
 
+class UndefinedNameError(DirectiveError):
+    """Raised when an expression references an undefined variable"""
+    pass
+
+
 class CompilationError(TemplateException):
     """Raised when template compilation fails"""
     pass
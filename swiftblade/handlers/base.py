@@ -10,7 +10,12 @@ if TYPE_CHECKING:
 
 
 class BaseHandler:
-    """Base class for directive handlers"""
+    """
+    Base class for directive handlers
+
+    Handlers must share the engine's evaluator (never instantiate their own
+    SafeEvaluator) so all handlers hit the same compiled-expression caches.
+    """
 
     def __init__(self, engine: 'BladeEngine'):
         self.engine = engine
@@ -1,209 +1,366 @@
-"""
-Loop Handler
-Handles @foreach and @for loop directives
-"""
-
-from typing import Dict, Any
-from collections import ChainMap
-
-from ..base import BaseHandler
-from ...exceptions import TemplateSyntaxError, BreakLoop, ContinueLoop, SecurityError
-from ...constants import ERROR_TEMPLATE_PREVIEW_LENGTH, FOREACH_PATTERN, FOR_PATTERN
-
-
-class LoopHandler(BaseHandler):
-    """Handles @foreach and @for loop structures"""
-
-    def __init__(self, engine):
-        super().__init__(engine)
-        # Reusable handlers to avoid creating new instances in loops
-        self._cond_handler = None
-        self._var_handler = None
-
-    def _get_cond_handler(self):
-        """Lazy-load conditional handler (reused across loop iterations)"""
-        if self._cond_handler is None:
-            from .conditionals import ConditionalHandler
-            self._cond_handler = ConditionalHandler(self.engine)
-        return self._cond_handler
-
-    def _get_var_handler(self):
-        """Lazy-load variable handler (reused across loop iterations)"""
-        if self._var_handler is None:
-            from ..variables import VariableHandler
-            self._var_handler = VariableHandler(self.engine)
-        return self._var_handler
-
-    def process(self, template: str, context: Dict[str, Any]) -> str:
-        """Process @foreach and @for loops"""
-        # Process @foreach
-        template = self._process_foreach(template, context)
-
-        # Process @for
-        template = self._process_for(template, context)
-
-        return template
-
-    def _find_matching_endforeach(self, template: str, start_pos: int) -> int:
-        """Find the matching @endforeach for a @foreach at start_pos, accounting for nesting"""
-        import re
-        depth = 1
-        pos = start_pos
-
-        while depth > 0 and pos < len(template):
-            # Find next @foreach or @endforeach
-            next_foreach = template.find('@foreach', pos)
-            next_endforeach = template.find('@endforeach', pos)
-
-            if next_endforeach == -1:
-                raise TemplateSyntaxError("Unmatched @foreach - missing @endforeach")
-
-            if next_foreach != -1 and next_foreach < next_endforeach:
-                depth += 1
-                pos = next_foreach + 8  # len('@foreach')
-            else:
-                depth -= 1
-                if depth == 0:
-                    return next_endforeach
-                pos = next_endforeach + 11  # len('@endforeach')
-
-        raise TemplateSyntaxError("Unmatched @foreach - missing @endforeach")
-
-    def _process_foreach(self, template: str, context: Dict[str, Any]) -> str:
-        """Process @foreach...@endforeach recursively with proper nesting support"""
-        import re
-
-        # Find all @foreach occurrences
-        foreach_pattern = re.compile(r'@foreach\s*\((.*?)\)')
-
-        result = template
-        offset = 0
-
-        while True:
-            match = foreach_pattern.search(result, offset)
-            if not match:
-                break
-
-            loop_header = match.group(1).strip()
-            start_pos = match.end()
-
-            # Find matching @endforeach accounting for nesting
-            end_pos = self._find_matching_endforeach(result, start_pos)
-            loop_body = result[start_pos:end_pos]
-
-            # Parse header: "item in items"
-            try:
-                loop_var, iterable_expr = loop_header.split(' in ', 1)
-                loop_var = loop_var.strip()
-
-                # Try to evaluate the iterable expression
-                iterable = self.evaluator.safe_eval(iterable_expr.strip(), context)
-            except Exception as e:
-                raise TemplateSyntaxError(f"Error in @foreach header: {e}", context=loop_header)
-
-            output = []
-
-            # Get reusable handlers once
-            cond_handler = self._get_cond_handler()
-            var_handler = self._get_var_handler()
-
-            try:
-                # Iteration limit (DoS prevention)
-                iteration_count = 0
-                for value in iterable:
-                    if iteration_count >= self.engine.max_loop_iterations:
-                        raise SecurityError(
-                            f"Maximum loop iterations exceeded: {iteration_count} (max: {self.engine.max_loop_iterations})",
-                            context=f"@foreach {loop_header}"
-                        )
-
-                    # Use ChainMap to avoid copying entire context dict
-                    loop_context = ChainMap({loop_var: value}, context)
-
-                    try:
-                        # First, recursively process any nested @foreach loops with updated context
-                        rendered = self._process_foreach(loop_body, loop_context)
-
-                        # Then process conditionals (@if/@else/@endif) within the loop body
-                        rendered = cond_handler.process(rendered, loop_context)
-
-                        # Finally process variables to render {{ item }} etc.
-                        rendered = var_handler.process(rendered, loop_context)
-                        output.append(rendered)
-                    except ContinueLoop:
-                        pass
-                    except BreakLoop:
-                        break
-                    finally:
-                        iteration_count += 1
-
-                replacement = ''.join(output)
-
-                # Replace the entire @foreach...@endforeach block
-                result = result[:match.start()] + replacement + result[end_pos + 11:]  # +11 for '@endforeach'
-                offset = match.start() + len(replacement)
-
-            except SecurityError:
-                raise
-            except Exception as e:
-                raise TemplateSyntaxError(f"Error in @foreach loop: {e}")
-
-        return result
-
-    def _process_for(self, template: str, context: Dict[str, Any]) -> str:
-        """Process @for...@endfor recursively"""
-        def replacer(match):
-            loop_header = match.group(1).strip()
-            loop_body = match.group(2)
-
-            # Parse header: "i in range(3)"
-            try:
-                loop_var, iterable_expr = loop_header.split(' in ', 1)
-                loop_var = loop_var.strip()
-                iterable = self.evaluator.safe_eval(iterable_expr.strip(), context)
-            except Exception as e:
-                raise TemplateSyntaxError(f"Error in @for header: {e}", context=loop_header)
-
-            output = []
-
-            # Get reusable handlers once
-            cond_handler = self._get_cond_handler()
-            var_handler = self._get_var_handler()
-
-            try:
-                # Iteration limit (DoS prevention)
-                iteration_count = 0
-                for value in iterable:
-                    if iteration_count >= self.engine.max_loop_iterations:
-                        raise SecurityError(
-                            f"Maximum loop iterations exceeded: {iteration_count} (max: {self.engine.max_loop_iterations})",
-                            context=f"@for {loop_header}"
-                        )
-
-                    # Use ChainMap to avoid copying entire context dict
-                    loop_context = ChainMap({loop_var: value}, context)
-
-                    try:
-                        # First, recursively process any nested @for loops with updated context
-                        rendered = self._process_for(loop_body, loop_context)
-
-                        # Then process conditionals (@if/@else/@endif) within the loop body
-                        rendered = cond_handler.process(rendered, loop_context)
-
-                        # Finally process variables to render {{ item }} etc.
-                        rendered = var_handler.process(rendered, loop_context)
-                        output.append(rendered)
-                    except ContinueLoop:
-                        pass
-                    except BreakLoop:
-                        break
-                    finally:
-                        iteration_count += 1
-
-                return ''.join(output)
-            except SecurityError:
-                raise
-            except Exception as e:
-                raise TemplateSyntaxError(f"Error in @for loop: {e}")
-
-        return FOR_PATTERN.sub(replacer, template)
+"""
+Loop Handler
+Handles @foreach and @for loop directives
+"""
+
+import functools
+import io
+import re
+from typing import Dict, Any, Tuple
+
+from ..base import BaseHandler
+from ..variables import VariableHandler
+from .conditionals import ConditionalHandler
+from ...exceptions import TemplateSyntaxError, BreakLoop, ContinueLoop, SecurityError
+from ...constants import (
+    ERROR_TEMPLATE_PREVIEW_LENGTH,
+    ESCAPED_VAR_PATTERN,
+    RAW_VAR_PATTERN,
+    FOREACH_PATTERN,
+    FOR_PATTERN,
+)
+
+# Marker for "loop variable had no previous binding" during restore
+_MISSING = object()
+
+# Iterables that may be live views of the context dict: the in-place
+# loop-var binding mutates the context, so these must be materialized
+# before iterating to avoid "dictionary changed size during iteration"
+_DICT_VIEW_TYPES = (dict, type({}.keys()), type({}.values()), type({}.items()))
+
+# @foreach opening tag with its header expression
+_FOREACH_HEADER_PATTERN = re.compile(r'@foreach\s*\((.*?)\)')
+
+# @foreach/@endforeach tokens for the single-pass nesting scan
+_FOREACH_TOKEN_PATTERN = re.compile(r'@(foreach|endforeach)\b')
+
+
+@functools.lru_cache(maxsize=128)
+def _loop_var_pattern(loop_var: str) -> re.Pattern:
+    """Word-boundary pattern for a loop variable (memoized per variable name)"""
+    return re.compile(rf'\b{re.escape(loop_var)}\b')
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_loop_header(loop_header: str) -> Tuple[str, str]:
+    """
+    Split a loop header like 'item in items' into (loop_var, iterable_expr)
+
+    Headers repeat verbatim across renders, so the parse is memoized; the
+    iterable expression's compiled form is cached inside safe_eval.
+    """
+    loop_var, iterable_expr = loop_header.split(' in ', 1)
+    return loop_var.strip(), iterable_expr.strip()
+
+
+class LoopHandler(BaseHandler):
+    """Handles @foreach and @for loop structures"""
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        # Reusable handlers to avoid creating new instances in loops
+        self._cond_handler = ConditionalHandler(engine)
+        self._var_handler = VariableHandler(engine)
+
+    def process(self, template: str, context: Dict[str, Any]) -> str:
+        """Process @foreach and @for loops"""
+        # Process @foreach
+        template = self._process_foreach(template, context)
+
+        # Process @for
+        template = self._process_for(template, context)
+
+        return template
+
+    def _find_matching_endforeach(self, template: str, start_pos: int) -> int:
+        """Find the matching @endforeach for a @foreach at start_pos, accounting for nesting"""
+        depth = 1
+
+        # Single forward token walk with a depth counter (linear in template
+        # length, instead of re-scanning the tail per nesting level)
+        for match in _FOREACH_TOKEN_PATTERN.finditer(template, start_pos):
+            if match.group(1) == 'foreach':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return match.start()
+
+        raise TemplateSyntaxError("Unmatched @foreach - missing @endforeach")
+
+    def _hoist_invariant_vars(self, loop_body: str, loop_var: str, context: Dict[str, Any]) -> str:
+        """
+        Pre-render {{ }} / {!! !!} outputs that don't depend on the loop
+        variable, so they are evaluated once instead of once per iteration
+
+        Expressions that fail to evaluate, or whose output could be picked
+        up by later handler passes, are left in place for the normal
+        per-iteration pass.
+        """
+        var_handler = self._var_handler
+        loop_var_pattern = _loop_var_pattern(loop_var)
+
+        def hoist(match, escape):
+            expr = match.group(1)
+            # Variant if it mentions the loop variable or the context helpers
+            if loop_var_pattern.search(expr) or 'context' in expr or 'isset' in expr:
+                return match.group(0)
+            try:
+                rendered = var_handler._output_variable(expr, context, escape=escape)
+            except Exception:
+                return match.group(0)
+            # Only inline output that later passes cannot re-interpret
+            if '{{' in rendered or '{!!' in rendered or '@' in rendered:
+                return match.group(0)
+            return rendered
+
+        loop_body = ESCAPED_VAR_PATTERN.sub(lambda m: hoist(m, True), loop_body)
+        loop_body = RAW_VAR_PATTERN.sub(lambda m: hoist(m, False), loop_body)
+        return loop_body
+
+    def _process_foreach(self, template: str, context: Dict[str, Any]) -> str:
+        """Process @foreach...@endforeach recursively with proper nesting support"""
+        # Stream into a shared buffer: rendered chunks and the static text
+        # between loops are written forward once, instead of re-splicing the
+        # whole template string after every loop
+        out = None
+        prev_end = 0
+        pos = 0
+
+        while True:
+            match = _FOREACH_HEADER_PATTERN.search(template, pos)
+            if not match:
+                break
+
+            loop_header = match.group(1).strip()
+            start_pos = match.end()
+
+            # Find matching @endforeach accounting for nesting
+            end_pos = self._find_matching_endforeach(template, start_pos)
+            loop_body = template[start_pos:end_pos]
+
+            if out is None:
+                out = io.StringIO()
+            out.write(template[prev_end:match.start()])
+
+            # Parse header: "item in items" (memoized)
+            try:
+                loop_var, iterable_expr = _parse_loop_header(loop_header)
+
+                # Try to evaluate the iterable expression
+                iterable = self.evaluator.safe_eval(iterable_expr, context)
+            except Exception as e:
+                raise TemplateSyntaxError(f"Error in @foreach header: {e}", context=loop_header)
+
+            # Snapshot dict/dict-view iterables so binding the loop var
+            # into the context can't invalidate them mid-iteration
+            if isinstance(iterable, _DICT_VIEW_TYPES):
+                iterable = list(iterable)
+
+            # Reusable handlers (constructed once in __init__)
+            cond_handler = self._cond_handler
+            var_handler = self._var_handler
+
+            # Pre-scan the body once so iterations skip handler passes that
+            # cannot match (cheap C-level substring checks)
+            has_nested = '@foreach' in loop_body
+            has_cond = '@if(' in loop_body
+            has_var = '{{' in loop_body or '{!!' in loop_body
+
+            # Render loop-invariant outputs once, before iterating
+            if has_var and not has_nested and '@python' not in loop_body:
+                loop_body = self._hoist_invariant_vars(loop_body, loop_var, context)
+                has_var = '{{' in loop_body or '{!!' in loop_body
+
+            # Pure-static body (no outputs, no directives): every iteration
+            # emits the body verbatim, so count the iterations (the security
+            # cap still applies) and write one repeated chunk
+            if not (has_nested or has_cond or has_var) and '@' not in loop_body:
+                iteration_count = 0
+                try:
+                    for _ in iterable:
+                        if iteration_count >= self.engine.max_loop_iterations:
+                            raise SecurityError(
+                                f"Maximum loop iterations exceeded: {iteration_count} (max: {self.engine.max_loop_iterations})",
+                                context=f"@foreach {loop_header}"
+                            )
+                        iteration_count += 1
+                except SecurityError:
+                    raise
+                except Exception as e:
+                    raise TemplateSyntaxError(f"Error in @foreach loop: {e}")
+
+                out.write(loop_body * iteration_count)
+                prev_end = end_pos + 11  # +11 for '@endforeach'
+                pos = prev_end
+                continue
+
+            # Bind loop_var in the context directly and restore the previous
+            # binding afterwards - no per-iteration ChainMap/dict allocation,
+            # and expression lookups stay single-layer
+            prev_binding = context.get(loop_var, _MISSING)
+
+            try:
+                # Iteration limit (DoS prevention)
+                iteration_count = 0
+                for value in iterable:
+                    if iteration_count >= self.engine.max_loop_iterations:
+                        raise SecurityError(
+                            f"Maximum loop iterations exceeded: {iteration_count} (max: {self.engine.max_loop_iterations})",
+                            context=f"@foreach {loop_header}"
+                        )
+
+                    context[loop_var] = value
+
+                    try:
+                        rendered = loop_body
+
+                        # First, recursively process any nested @foreach loops with updated context
+                        if has_nested:
+                            rendered = self._process_foreach(rendered, context)
+
+                        # Then process conditionals (@if/@else/@endif) within the loop body
+                        if has_cond:
+                            rendered = cond_handler.process(rendered, context)
+
+                        # Finally process variables to render {{ item }} etc.
+                        if has_var:
+                            rendered = var_handler.process(rendered, context)
+                        out.write(rendered)
+                    except ContinueLoop:
+                        pass
+                    except BreakLoop:
+                        break
+                    finally:
+                        iteration_count += 1
+
+                # Skip past the consumed @foreach...@endforeach block
+                prev_end = end_pos + 11  # +11 for '@endforeach'
+                pos = prev_end
+
+            except SecurityError:
+                raise
+            except Exception as e:
+                raise TemplateSyntaxError(f"Error in @foreach loop: {e}")
+            finally:
+                if prev_binding is _MISSING:
+                    context.pop(loop_var, None)
+                else:
+                    context[loop_var] = prev_binding
+
+        if out is None:
+            # No @foreach in this template
+            return template
+
+        out.write(template[prev_end:])
+        return out.getvalue()
+
+    def _process_for(self, template: str, context: Dict[str, Any]) -> str:
+        """Process @for...@endfor recursively"""
+        def replacer(match):
+            loop_header = match.group(1).strip()
+            loop_body = match.group(2)
+
+            # Parse header: "i in range(3)" (memoized)
+            try:
+                loop_var, iterable_expr = _parse_loop_header(loop_header)
+                iterable = self.evaluator.safe_eval(iterable_expr, context)
+            except Exception as e:
+                raise TemplateSyntaxError(f"Error in @for header: {e}", context=loop_header)
+
+            # Snapshot dict/dict-view iterables so binding the loop var
+            # into the context can't invalidate them mid-iteration
+            if isinstance(iterable, _DICT_VIEW_TYPES):
+                iterable = list(iterable)
+
+            # Accumulate via += : CPython resizes the target string in place
+            # when it holds the only reference, so this beats list+join for
+            # the one-chunk-per-iteration shape
+            output = ''
+
+            # Reusable handlers (constructed once in __init__)
+            cond_handler = self._cond_handler
+            var_handler = self._var_handler
+
+            # Pre-scan the body once so iterations skip handler passes that
+            # cannot match (cheap C-level substring checks)
+            has_nested = '@for' in loop_body
+            has_cond = '@if(' in loop_body
+            has_var = '{{' in loop_body or '{!!' in loop_body
+
+            # Render loop-invariant outputs once, before iterating
+            if has_var and not has_nested and '@python' not in loop_body:
+                loop_body = self._hoist_invariant_vars(loop_body, loop_var, context)
+                has_var = '{{' in loop_body or '{!!' in loop_body
+
+            # Pure-static body (no outputs, no directives): every iteration
+            # emits the body verbatim, so count the iterations (the security
+            # cap still applies) and return one repeated chunk
+            if not (has_nested or has_cond or has_var) and '@' not in loop_body:
+                iteration_count = 0
+                try:
+                    for _ in iterable:
+                        if iteration_count >= self.engine.max_loop_iterations:
+                            raise SecurityError(
+                                f"Maximum loop iterations exceeded: {iteration_count} (max: {self.engine.max_loop_iterations})",
+                                context=f"@for {loop_header}"
+                            )
+                        iteration_count += 1
+                except SecurityError:
+                    raise
+                except Exception as e:
+                    raise TemplateSyntaxError(f"Error in @for loop: {e}")
+
+                return loop_body * iteration_count
+
+            # Bind loop_var in the context directly and restore the previous
+            # binding afterwards - no per-iteration ChainMap/dict allocation,
+            # and expression lookups stay single-layer
+            prev_binding = context.get(loop_var, _MISSING)
+
+            try:
+                # Iteration limit (DoS prevention)
+                iteration_count = 0
+                for value in iterable:
+                    if iteration_count >= self.engine.max_loop_iterations:
+                        raise SecurityError(
+                            f"Maximum loop iterations exceeded: {iteration_count} (max: {self.engine.max_loop_iterations})",
+                            context=f"@for {loop_header}"
+                        )
+
+                    context[loop_var] = value
+
+                    try:
+                        rendered = loop_body
+
+                        # First, recursively process any nested @for loops with updated context
+                        if has_nested:
+                            rendered = self._process_for(rendered, context)
+
+                        # Then process conditionals (@if/@else/@endif) within the loop body
+                        if has_cond:
+                            rendered = cond_handler.process(rendered, context)
+
+                        # Finally process variables to render {{ item }} etc.
+                        if has_var:
+                            rendered = var_handler.process(rendered, context)
+                        output += rendered
+                    except ContinueLoop:
+                        pass
+                    except BreakLoop:
+                        break
+                    finally:
+                        iteration_count += 1
+
+                return output
+            except SecurityError:
+                raise
+            except Exception as e:
+                raise TemplateSyntaxError(f"Error in @for loop: {e}")
+            finally:
+                if prev_binding is _MISSING:
+                    context.pop(loop_var, None)
+                else:
+                    context[loop_var] = prev_binding
+
+        return FOR_PATTERN.sub(replacer, template)
@@ -3,16 +3,28 @@ Misc Control Handler
 Handles @isset, @empty, @python, and comment directives
 """
 
+import textwrap
 from typing import Dict, Any
 
 from ..base import BaseHandler
 from ...exceptions import SecurityError
-from ...constants import COMMENT_PATTERN, PYTHON_PATTERN, ISSET_PATTERN, EMPTY_PATTERN
+from ...constants import COMMENT_PATTERN, PYTHON_PATTERN, ISSET_EMPTY_PATTERN
 
 
 class MiscHandler(BaseHandler):
     """Handles miscellaneous control structures: @isset, @empty, @python, comments"""
 
+    def __init__(self, engine):
+        super().__init__(engine)
+        self._ctrl_handler_cache = None  # Lazy-load control handler
+
+    def _get_ctrl_handler(self):
+        """Get cached control structure handler (lazy initialization)"""
+        if self._ctrl_handler_cache is None:
+            from . import ControlStructureHandler
+            self._ctrl_handler_cache = ControlStructureHandler(self.engine)
+        return self._ctrl_handler_cache
+
     def process(self, template: str, context: Dict[str, Any]) -> str:
         """Process miscellaneous control structures"""
         # Remove comments first
@@ -28,83 +40,53 @@ class MiscHandler(BaseHandler):
 
     def _process_comments(self, template: str) -> str:
         """Remove {{-- comments --}}"""
+        # Fast path: skip the regex pass when no comment opener is present
+        if '{{--' not in template:
+            return template
         return COMMENT_PATTERN.sub('', template)
 
     def _process_python(self, template: str, context: Dict[str, Any]) -> str:
         """Process @python...@endpython blocks"""
+        # Fast path: skip the security check and regex pass entirely
+        if '@python' not in template:
+            return template
 
         # Security check: Ensure @python blocks are explicitly enabled
-        if '@python' in template and not self.engine.allow_python_blocks:
+        if not self.engine.allow_python_blocks:
             raise SecurityError(
                 "@python blocks are disabled for security. "
                 "Set allow_python_blocks=True in BladeEngine() to enable (not recommended)."
             )
 
         def replacer(match):
-            code = match.group(1)
-
-            # Manual dedent: find common leading whitespace (ignoring first/last empty lines)
-            lines = code.split('\n')
-
-            # Remove completely empty first/last lines
-            while lines and not lines[0].strip():
-                lines.pop(0)
-            while lines and not lines[-1].strip():
-                lines.pop()
-
-            if not lines:
-                return ''
-
-            # Find minimum indentation from non-empty lines
-            min_indent = float('inf')
-            for line in lines:
-                if line.strip():  # Skip empty lines
-                    stripped = line.lstrip()
-                    indent = len(line) - len(stripped)
-                    min_indent = min(min_indent, indent)
-
-            # Remove min_indent from all lines
-            if min_indent != float('inf') and min_indent > 0:
-                dedented = []
-                for line in lines:
-                    if line.strip():
-                        dedented.append(line[min_indent:])
-                    else:
-                        dedented.append('')
-                code = '\n'.join(dedented)
-            else:
-                code = '\n'.join(lines)
-
+            # Dedent in a single pass instead of the per-line Python loop
+            # (textwrap.dedent ignores whitespace-only lines when computing
+            # the margin; safe_exec strips surrounding whitespace itself)
+            code = textwrap.dedent(match.group(1).strip('\n'))
             self.evaluator.safe_exec(code, context)
             return ''
 
         return PYTHON_PATTERN.sub(replacer, template)
 
     def _process_isset_empty(self, template: str, context: Dict[str, Any]) -> str:
-        """Process @isset and @empty"""
+        """Process @isset and @empty in a single combined pass"""
+        # Fast path: skip the regex pass when neither directive is present
+        if '@isset' not in template and '@empty' not in template:
+            return template
 
-        # @isset
-        def isset_replacer(match):
-            var_name = match.group(2).strip()
-            body = match.group(3)
-            if var_name in context and context[var_name] is not None:
-                # Process the body
-                from . import ControlStructureHandler
-                ctrl_handler = ControlStructureHandler(self.engine)
-                return ctrl_handler.process(body, context)
-            return ''
+        def replacer(match):
+            kind = match.group(1)
+            var_name = match.group(3).strip()
+            body = match.group(4)
 
-        template = ISSET_PATTERN.sub(isset_replacer, template)
+            if kind == 'isset':
+                show = var_name in context and context[var_name] is not None
+            else:  # empty
+                show = not context.get(var_name)
 
-        # @empty
-        def empty_replacer(match):
-            var_name = match.group(2).strip()
-            body = match.group(3)
-            if not context.get(var_name):
+            if show:
                 # Process the body
-                from . import ControlStructureHandler
-                ctrl_handler = ControlStructureHandler(self.engine)
-                return ctrl_handler.process(body, context)
+                return self._get_ctrl_handler().process(body, context)
             return ''
 
-        return EMPTY_PATTERN.sub(empty_replacer, template)
+        return ISSET_EMPTY_PATTERN.sub(replacer, template)
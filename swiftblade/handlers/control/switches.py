@@ -3,56 +3,80 @@ Switch Handler
 Handles @switch/@case/@default directives
 """
 
-from typing import Dict, Any
+import functools
+from typing import Dict, Any, Optional, Tuple
 
 from ..base import BaseHandler
 from ...exceptions import TemplateSyntaxError
 from ...constants import SWITCH_PATTERN, CASE_PATTERN, DEFAULT_PATTERN, BREAK_PATTERN
 
 
+@functools.lru_cache(maxsize=256)
+def _parse_switch_body(switch_body: str) -> Tuple[Tuple[Tuple[str, str], ...], Optional[str]]:
+    """
+    Parse a switch body into ((case_expr, case_body), ...) and the default body
+
+    Switch bodies repeat verbatim across renders, so the regex scans and
+    @break stripping run once per distinct body instead of once per render.
+    Case expressions are evaluated through safe_eval, which caches their
+    compiled form.
+    """
+    cases = tuple(
+        (case_match.group(1).strip(), BREAK_PATTERN.sub('', case_match.group(2)))
+        for case_match in CASE_PATTERN.finditer(switch_body)
+    )
+
+    default_match = DEFAULT_PATTERN.search(switch_body)
+    default_body = BREAK_PATTERN.sub('', default_match.group(1)) if default_match else None
+
+    return cases, default_body
+
+
 class SwitchHandler(BaseHandler):
     """Handles @switch/@case/@default structures"""
 
+    def __init__(self, engine):
+        super().__init__(engine)
+        self._ctrl_handler_cache = None  # Lazy-load control handler
+
+    def _get_ctrl_handler(self):
+        """Get cached control structure handler (lazy initialization)"""
+        if self._ctrl_handler_cache is None:
+            from . import ControlStructureHandler
+            self._ctrl_handler_cache = ControlStructureHandler(self.engine)
+        return self._ctrl_handler_cache
+
     def process(self, template: str, context: Dict[str, Any]) -> str:
         """Process @switch...@endswitch"""
+        if '@switch' not in template:
+            return template
+
         def replacer(match):
             switch_expr = match.group(1).strip()
-            switch_body = match.group(2)
 
             try:
                 switch_value = self.evaluator.safe_eval(switch_expr, context)
             except Exception as e:
                 raise TemplateSyntaxError(f"Error in @switch expression: {e}", context=switch_expr)
 
-            # Find matching case
-            for case_match in CASE_PATTERN.finditer(switch_body):
-                case_expr = case_match.group(1).strip()
-                case_body = case_match.group(2)
+            # Parse cases and default once per distinct body (memoized)
+            cases, default_body = _parse_switch_body(match.group(2))
 
+            # Find matching case
+            for case_expr, case_body in cases:
                 try:
                     case_value = self.evaluator.safe_eval(case_expr, context)
                 except Exception:
                     continue
 
                 if switch_value == case_value:
-                    # Remove @break
-                    case_body = BREAK_PATTERN.sub('', case_body)
-
                     # Process the case body
-                    from . import ControlStructureHandler
-                    ctrl_handler = ControlStructureHandler(self.engine)
-                    return ctrl_handler.process(case_body, context)
+                    return self._get_ctrl_handler().process(case_body, context)
 
             # Check @default
-            default_match = DEFAULT_PATTERN.search(switch_body)
-            if default_match:
-                default_body = default_match.group(1)
-                default_body = BREAK_PATTERN.sub('', default_body)
-
+            if default_body is not None:
                 # Process the default body
-                from . import ControlStructureHandler
-                ctrl_handler = ControlStructureHandler(self.engine)
-                return ctrl_handler.process(default_body, context)
+                return self._get_ctrl_handler().process(default_body, context)
 
             return ''
 
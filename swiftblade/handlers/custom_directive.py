@@ -3,73 +3,102 @@ Custom Directive Handler
 Handles custom directives registered via engine.register_directive()
 """
 
-import re
-from typing import Dict, Any, TYPE_CHECKING
+import ast
+import logging
+import sys
+from typing import Dict, Any, List, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..engine import BladeEngine
 
 from .base import BaseHandler
-from ..utils.safe_string import SafeString
+
+logger = logging.getLogger('swiftblade.custom_directive')
 
 
 class CustomDirectiveHandler(BaseHandler):
     """Handles custom directives registered by users"""
 
     def process(self, template: str, context: Dict[str, Any]) -> str:
-        """Process all registered custom directives"""
+        """Process all registered custom directives in a single scan"""
 
-        # Get all registered directives from the engine
+        # Get the combined dispatch pattern from the engine's registry.
+        # One alternation over every registered name means one template
+        # scan total, instead of one scan per directive.
         registry = self.engine.directive_registry
+        pattern = registry.combined_pattern()
+
+        if pattern is None or '@' not in template:
+            return template
+
+        template_len = len(template)
+        parts = []
+        prev_end = 0
+        pos = 0
+
+        while True:
+            match = pattern.search(template, pos)
+            if match is None:
+                break
+
+            # Registry keys are interned at registration; interning the
+            # extracted name makes the dispatch lookup compare by pointer
+            directive_name = sys.intern(match.group(1))
+            idx = match.start()
+
+            # Allow whitespace between the name and the opening paren.
+            # Arguments are located with a linear depth-counting scan,
+            # so arbitrarily nested parentheses are handled.
+            open_paren = match.end()
+            while open_paren < template_len and template[open_paren].isspace():
+                open_paren += 1
+
+            if open_paren < template_len and template[open_paren] == '(':
+                close_paren = self._find_call_end(template, open_paren + 1)
+                if close_paren == -1:
+                    pos = match.end()
+                    continue
+                args = self._parse_args(template[open_paren + 1:close_paren].strip(), context)
+                end = close_paren + 1
+            else:
+                # No parentheses - call with empty args list
+                args = []
+                end = match.end()
 
-        # Process each registered directive
-        for directive_name in registry.directives.keys():
-            template = self._process_directive(template, directive_name, context)
-
-        return template
-
-    def _process_directive(self, template: str, directive_name: str, context: Dict[str, Any]) -> str:
-        """
-        Process a single custom directive
-
-        Supports both patterns:
-        - @directiveName(args)  - with arguments
-        - @directiveName        - without parentheses (calls with empty args)
-        """
-        # Pattern 1: @directiveName(...) - with parentheses
-        pattern_with_parens = rf'@{directive_name}\s*\(((?:[^()]*|\([^)]*\))*)\)'
-
-        # Pattern 2: @directiveName - without parentheses (must not be followed by '(')
-        pattern_without_parens = rf'@{directive_name}(?!\s*\()'
-
-        def replacer_with_args(match):
-            """Replace directive with arguments"""
-            args_str = match.group(1).strip()
-            args = self._parse_args(args_str, context)
-
-            try:
-                result = self.engine.directive_registry.process(directive_name, args, context)
-                return SafeString(str(result)) if result is not None else ''
-            except Exception as e:
-                print(f"Error in @{directive_name}: {e}")
-                return match.group(0)
-
-        def replacer_without_args(match):
-            """Replace directive without arguments (call with empty args list)"""
             try:
-                result = self.engine.directive_registry.process(directive_name, [], context)
-                return SafeString(str(result)) if result is not None else ''
+                result = registry.process(directive_name, args, context)
+                replacement = str(result) if result is not None else ''
             except Exception as e:
-                print(f"Error in @{directive_name}: {e}")
-                return match.group(0)
-
-        # First, replace directives WITH parentheses
-        template = re.sub(pattern_with_parens, replacer_with_args, template)
-
-        # Then, replace directives WITHOUT parentheses
-        template = re.sub(pattern_without_parens, replacer_without_args, template)
-
-        return template
+                # Logged rather than printed: failing directives are an
+                # expected path (the original text is kept), and stdout
+                # writes are costly inside render loops
+                logger.debug("Error in @%s: %s", directive_name, e)
+                replacement = template[idx:end]
+
+            parts.append(template[prev_end:idx])
+            parts.append(replacement)
+            prev_end = end
+            pos = end
+
+        if not parts:
+            return template
+
+        parts.append(template[prev_end:])
+        return ''.join(parts)
+
+    @staticmethod
+    def _find_call_end(template: str, start: int) -> int:
+        """Find the index of the ')' matching an already-consumed '('"""
+        depth = 1
+        for i in range(start, len(template)):
+            char = template[i]
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    return i
+        return -1
 
     def _parse_args(self, args_str: str, context: Dict[str, Any]) -> list:
         """
@@ -83,6 +112,40 @@ class CustomDirectiveHandler(BaseHandler):
         if not args_str:
             return []
 
+        # Split on top-level commas via the C-level parser: wrap the args in
+        # a dummy call and slice each positional argument back out of the
+        # source. Handles nested quotes/brackets/parens/braces for free.
+        args = None
+        try:
+            source = f'_args({args_str})'
+            call = ast.parse(source, mode='eval').body
+            if isinstance(call, ast.Call) and not call.keywords:
+                args = [
+                    (ast.get_source_segment(source, arg_node) or ast.unparse(arg_node)).strip()
+                    for arg_node in call.args
+                ]
+        except SyntaxError:
+            pass
+
+        if args is None:
+            # Not valid Python argument syntax - fall back to the scanner
+            args = self._split_args(args_str)
+
+        # Evaluate each argument
+        evaluated_args = []
+        for arg in args:
+            try:
+                # Try to evaluate as expression
+                value = self.evaluator.safe_eval(arg, context)
+                evaluated_args.append(value)
+            except:
+                # If evaluation fails, use as string
+                evaluated_args.append(arg)
+
+        return evaluated_args
+
+    def _split_args(self, args_str: str) -> List[str]:
+        """Split an argument string on top-level commas (fallback scanner)"""
         # Split by commas (but respect quotes, parentheses, and braces)
         args = []
         current_arg = ''
@@ -130,15 +193,4 @@ class CustomDirectiveHandler(BaseHandler):
         if current_arg.strip():
             args.append(current_arg.strip())
 
-        # Evaluate each argument
-        evaluated_args = []
-        for arg in args:
-            try:
-                # Try to evaluate as expression
-                value = self.evaluator.safe_eval(arg, context)
-                evaluated_args.append(value)
-            except:
-                # If evaluation fails, use as string
-                evaluated_args.append(arg)
-
-        return evaluated_args
+        return args
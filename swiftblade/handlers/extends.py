@@ -10,10 +10,24 @@ from .base import BaseHandler
 from ..exceptions import TemplateNotFoundException
 from ..constants import EXTENDS_PATTERN, SECTION_PATTERN, YIELD_PATTERN
 
+# Positional indexes for SECTION_PATTERN's named groups: match.group(int)
+# is a C-level array index, while group('name') does a groupindex dict
+# lookup on every call
+_SECTION_NAME_GROUP = SECTION_PATTERN.groupindex['name']
+_SECTION_INLINE_GROUP = SECTION_PATTERN.groupindex['inline']
+_SECTION_BLOCK_GROUP = SECTION_PATTERN.groupindex['block']
+
 
 class ExtendsHandler(BaseHandler):
     """Handles @extends and @section/@yield directives"""
 
+    def __init__(self, engine):
+        super().__init__(engine)
+        # Parent layouts are shared by many child templates and re-read on
+        # every render; keep (mtime, contents) per path so the hot path is
+        # one stat call plus a dict hit instead of a read+decode
+        self._parent_cache: Dict[str, Tuple[float, str]] = {}
+
     def process(self, template: str, context: Dict[str, Any], parser) -> str:
         """Process @extends directive"""
         match = EXTENDS_PATTERN.search(template)
@@ -36,13 +50,21 @@ class ExtendsHandler(BaseHandler):
         if self.engine.cache:
             parent_template = self.engine.cache.get(parent_path)
 
-        # If not in cache, read from disk
+        # If not in cache, read from disk (reusing the mtime-validated copy)
         if parent_template is None:
-            if not os.path.exists(parent_path):
+            # One stat resolves existence and the mtime together, instead
+            # of an os.path.exists syscall followed by a getmtime syscall
+            try:
+                mtime = os.stat(parent_path).st_mtime
+            except OSError:
                 raise TemplateNotFoundException(f"Parent template '{parent_name}' not found", template_name=parent_name)
-
-            with open(parent_path, "r", encoding=self.engine.encoding) as f:
-                parent_template = f.read()
+            cached = self._parent_cache.get(parent_path)
+            if cached is not None and cached[0] == mtime:
+                parent_template = cached[1]
+            else:
+                with open(parent_path, "r", encoding=self.engine.encoding) as f:
+                    parent_template = f.read()
+                self._parent_cache[parent_path] = (mtime, parent_template)
 
             # Store in cache for future use
             if self.engine.cache:
@@ -65,19 +87,28 @@ class ExtendsHandler(BaseHandler):
         return result
 
     def _extract_sections(self, template: str) -> Tuple[Dict[str, str], str]:
-        """Extract @section directives"""
+        """Extract @section directives and strip them in a single scan"""
         sections = {}
+        remaining_parts = []
+        prev_end = 0
 
-        # Match both inline and block sections
+        # Match both inline and block sections, collecting the text between
+        # them as we go - one finditer pass partitions the template instead
+        # of a second full sub('') scan
         for match in SECTION_PATTERN.finditer(template):
-            name = match.group('name').strip()
-            content = match.group('inline') or match.group('block') or ''
+            name = match.group(_SECTION_NAME_GROUP).strip()
+            content = match.group(_SECTION_INLINE_GROUP) or match.group(_SECTION_BLOCK_GROUP) or ''
             sections[name] = content.strip()
 
-        # Remove all sections
-        template = SECTION_PATTERN.sub('', template)
+            remaining_parts.append(template[prev_end:match.start()])
+            prev_end = match.end()
+
+        if not remaining_parts:
+            # No sections found
+            return sections, template
 
-        return sections, template
+        remaining_parts.append(template[prev_end:])
+        return sections, ''.join(remaining_parts)
 
     def _replace_yields(self, template: str, sections: Dict[str, str], context: Dict[str, Any], parser) -> str:
         """Replace @yield directives with section content"""
@@ -86,7 +117,10 @@ class ExtendsHandler(BaseHandler):
             default = match.group(3) or ''
             content = sections.get(name, default)
 
-            if content:
+            # Literal sections (no directives, no outputs) are emitted
+            # as-is - three substring tests vs. re-entering the full
+            # parser pipeline per yield
+            if content and ('@' in content or '{{' in content or '{!!' in content):
                 # Process the content for nested directives
                 content = parser.process_template(content, context)
 
@@ -3,13 +3,61 @@ Variable Handler
 Handles {{ }} (escaped) and {!! !!} (raw) variable output
 """
 
+import functools
 import re
 import keyword
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 from .base import BaseHandler
 from ..exceptions import SecurityError
-from ..constants import ESCAPED_VAR_PATTERN, RAW_VAR_PATTERN
+from ..utils.safe_string import SafeString
+from ..constants import VAR_OUTPUT_PATTERN
+
+# HTML escape table: one C-level pass over the string via str.translate,
+# instead of five sequential str.replace scans/allocations
+_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;',
+})
+
+# Prefilter for the escape step: most outputs (numbers, IDs, plain words)
+# contain no special characters, and a single character-class search is
+# cheaper than translate's rebuild-and-allocate
+_ESCAPE_CHAR_PATTERN = re.compile(r'[&<>"\']')
+
+
+@functools.lru_cache(maxsize=4096)
+def _prepare_expression(expr_clean: str) -> Tuple[bool, str]:
+    """
+    Normalize a cleaned {{ }} expression for evaluation (memoized)
+
+    Returns (is_reserved_keyword, expression): either the bare name of a
+    reserved keyword to read straight from the context, or the $-stripped,
+    keyword-translated expression to hand to safe_eval. Expressions repeat
+    verbatim across renders (and per loop iteration), so the regex matching
+    and keyword translation run once per distinct expression; safe_eval
+    then caches the validated compiled form keyed by the returned text.
+    """
+    simple_var_match = VariableHandler._SIMPLE_VAR_PATTERN.match(expr_clean)
+    if simple_var_match:
+        var_name = simple_var_match.group(1)
+        if keyword.iskeyword(var_name):
+            # Reserved keyword - read via direct dict access
+            return True, var_name
+        # Normal variable - strip $ and eval
+        return False, var_name
+
+    # Complex expression - strip $ and translate reserved keywords
+    if VariableHandler._STARTS_WITH_DOLLAR_VAR.match(expr_clean):
+        expr_clean = VariableHandler._DOLLAR_VAR_PATTERN.sub(r'\1', expr_clean)
+
+    # Translate reserved keywords to context.get() calls
+    # This allows expressions like: class if class else ''
+    # To become: context.get('class','') if context.get('class','') else ''
+    return False, VariableHandler._translate_reserved_keywords(expr_clean)
 
 
 class VariableHandler(BaseHandler):
@@ -25,12 +73,30 @@ class VariableHandler(BaseHandler):
         'lambda',                # Lambda expressions
     }
 
+    # Keywords that DO get translated: computed once, so the per-identifier
+    # check is a single frozenset membership test instead of an
+    # iskeyword() call plus a second set lookup
+    _TRANSLATABLE_KEYWORDS = frozenset(keyword.kwlist) - OPERATOR_KEYWORDS
+
+    # Prefilter for keyword translation: expressions like 'user.name' or
+    # 'items[0]' contain no reserved words, and one alternation search is
+    # far cheaper than the callback-driven identifier sub
+    _KEYWORD_PREFILTER = re.compile(r'\b(?:' + '|'.join(sorted(_TRANSLATABLE_KEYWORDS)) + r')\b')
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        # Context for the current process() call, read by _render_match so
+        # sub() can take a bound method instead of a fresh per-call closure
+        self._ctx: Optional[Dict[str, Any]] = None
+
     # Pre-compiled regex patterns (class-level to avoid recompilation)
     _IDENTIFIER_PATTERN = re.compile(r'(?<![.\'\"])\b([a-zA-Z_]\w*)\b(?![.\'\"])')
     _SIMPLE_VAR_PATTERN = re.compile(r'^\$([a-zA-Z_]\w*)$')
     _DOLLAR_VAR_PATTERN = re.compile(r'\$([a-zA-Z_]\w*)')
+    _STARTS_WITH_DOLLAR_VAR = re.compile(r'^\$[a-zA-Z_]')
 
-    def _translate_reserved_keywords(self, expr: str, context: Dict[str, Any]) -> str:
+    @classmethod
+    def _translate_reserved_keywords(cls, expr: str) -> str:
         """
         Translate Python reserved keywords to context.get() calls
 
@@ -38,77 +104,68 @@ class VariableHandler(BaseHandler):
             'class if class else ""'
             -> 'context.get("class","") if context.get("class","") else ""'
         """
+        # Fast path: no reserved word anywhere in the expression
+        if cls._KEYWORD_PREFILTER.search(expr) is None:
+            return expr
+
         # Find all standalone identifiers that are reserved keywords
         def replace_keyword(match):
             word = match.group(0)
-            # Only translate if it's a keyword AND not an operator AND exists in context
-            if keyword.iskeyword(word) and word not in self.OPERATOR_KEYWORDS:
+            # Only translate keywords that aren't operators (precomputed set)
+            if word in cls._TRANSLATABLE_KEYWORDS:
                 # Use context.get() for safe access
                 return f'context.get("{word}","")'
             return word
 
         # Use pre-compiled pattern
-        return self._IDENTIFIER_PATTERN.sub(replace_keyword, expr)
+        return cls._IDENTIFIER_PATTERN.sub(replace_keyword, expr)
 
     def process(self, template: str, context: Dict[str, Any]) -> str:
         """Process variable output"""
 
-        # Process {{ }} for escaped output
-        template = ESCAPED_VAR_PATTERN.sub(
-            lambda m: self._output_variable(m.group(1), context, escape=True),
-            template
-        )
-
-        # Process {!! !!} for raw output
-        template = RAW_VAR_PATTERN.sub(
-            lambda m: self._output_variable(m.group(1), context, escape=False),
-            template
-        )
+        # One fused pass handles both {{ }} (escaped) and {!! !!} (raw):
+        # the template is scanned and the output allocated once, with the
+        # matched group name selecting the escaping mode. The context is
+        # stashed on the handler (saved/restored for nested process calls)
+        # so the callback is a plain bound method, not a per-call closure.
+        prev_ctx = self._ctx
+        self._ctx = context
+        try:
+            return VAR_OUTPUT_PATTERN.sub(self._render_match, template)
+        finally:
+            self._ctx = prev_ctx
 
-        return template
+    def _render_match(self, match) -> str:
+        """Render a single fused-pattern match ({{ }} or {!! !!})"""
+        group = match.lastgroup
+        return self._output_variable(match.group(group), self._ctx, escape=group == 'esc')
 
     def _output_variable(self, expr: str, context: Dict[str, Any], escape: bool = True) -> str:
         """Evaluate and output variable"""
+        # Note: rendered results are deliberately NOT cached per context -
+        # the loop handler rebinds the loop variable in the same dict, so
+        # any key involving id(context) would serve stale values. Repeat
+        # cost is bounded instead by the _prepare_expression cache and
+        # safe_eval's compiled-code cache/specialization.
         try:
-            expr_clean = expr.strip()
-
-            # Check if it's a simple $variable access for a reserved keyword
-            simple_var_match = self._SIMPLE_VAR_PATTERN.match(expr_clean)
-            if simple_var_match:
-                var_name = simple_var_match.group(1)
-                if keyword.iskeyword(var_name):
-                    # Reserved keyword - use direct dict access
-                    value = context.get(var_name, '')
-                else:
-                    # Normal variable - strip $ and eval
-                    value = self.evaluator.safe_eval(var_name, context)
-            else:
-                # Complex expression - strip $ and translate reserved keywords
-                if expr_clean.startswith('$'):
-                    if len(expr_clean) > 1 and (expr_clean[1].isalpha() or expr_clean[1] == '_'):
-                        expr_clean = self._DOLLAR_VAR_PATTERN.sub(r'\1', expr_clean)
+            # Normalization is memoized per distinct expression text
+            is_keyword, prepared = _prepare_expression(expr.strip())
 
-                # Translate reserved keywords to context.get() calls
-                # This allows expressions like: class if class else ''
-                # To become: context.get('class','') if context.get('class','') else ''
-                expr_clean = self._translate_reserved_keywords(expr_clean, context)
-
-                value = self.evaluator.safe_eval(expr_clean, context)
+            if is_keyword:
+                # Reserved keyword - use direct dict access
+                value = context.get(prepared, '')
+            else:
+                value = self.evaluator.safe_eval(prepared, context)
             result = str(value) if value is not None else ''
 
             # Check if value is marked as safe (like slot content)
-            from ..utils.safe_string import SafeString
             if isinstance(value, SafeString):
                 # Don't escape safe strings (already processed HTML)
                 return result
 
-            if escape:
+            if escape and _ESCAPE_CHAR_PATTERN.search(result) is not None:
                 # Basic HTML escaping
-                result = result.replace('&', '&amp;')
-                result = result.replace('<', '&lt;')
-                result = result.replace('>', '&gt;')
-                result = result.replace('"', '&quot;')
-                result = result.replace("'", '&#x27;')
+                result = result.translate(_ESCAPE_TABLE)
 
             return result
         except SecurityError:
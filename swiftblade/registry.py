@@ -4,7 +4,9 @@ Registry for custom directives
 Allows extending template engine with custom @directives
 """
 
-from typing import Dict, Any, Callable
+import re
+import sys
+from typing import Dict, Any, Callable, Optional
 
 from .exceptions import DirectiveError
 
@@ -17,6 +19,10 @@ class DirectiveRegistry:
 
     def __init__(self):
         self.directives: Dict[str, Callable] = {}
+        # Single alternation pattern over all registered names, so one
+        # template scan dispatches every directive. Rebuilt lazily after
+        # register/unregister; cached across renders.
+        self._combined_pattern: Optional[re.Pattern] = None
 
     def register(self, name: str, handler: Callable):
         """
@@ -30,7 +36,24 @@ class DirectiveRegistry:
             registry.register('upper', lambda args, ctx: args[0].upper())
             # Usage in template: @upper('hello')
         """
-        self.directives[name] = handler
+        # Interned keys let dict lookups short-circuit on pointer equality
+        # when callers intern the names they extract from templates
+        self.directives[sys.intern(name)] = handler
+        self._combined_pattern = None
+
+    def combined_pattern(self) -> Optional[re.Pattern]:
+        """
+        Get the combined dispatch pattern for all registered directives
+
+        Returns None when no directives are registered. Longer names come
+        first in the alternation so prefixes don't shadow them.
+        """
+        if self._combined_pattern is None and self.directives:
+            names = sorted(self.directives, key=len, reverse=True)
+            self._combined_pattern = re.compile(
+                '@(' + '|'.join(map(re.escape, names)) + r')\b'
+            )
+        return self._combined_pattern
 
     def has(self, name: str) -> bool:
         """Check if directive is registered"""
@@ -49,17 +72,22 @@ class DirectiveRegistry:
             Processed result
 
         Raises:
-            DirectiveError: If directive not found or fails
+            DirectiveError: If directive not found
+
+        Handler exceptions propagate unchanged: wrapping them cost a
+        try/except frame on every successful call and discarded the
+        original traceback, and the directive handler already catches
+        failures (keeping the original template text).
         """
-        if name not in self.directives:
+        # Single dict lookup resolves existence and the handler at once
+        handler = self.directives.get(name)
+        if handler is None:
             raise DirectiveError(f"Directive '@{name}' is not registered")
 
-        try:
-            return self.directives[name](args, context)
-        except Exception as e:
-            raise DirectiveError(f"Error processing @{name}: {e}")
+        return handler(args, context)
 
     def unregister(self, name: str):
         """Unregister a directive"""
         if name in self.directives:
             del self.directives[name]
+            self._combined_pattern = None